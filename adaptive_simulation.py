@@ -0,0 +1,367 @@
+import math
+import random
+from typing import Callable
+
+from main import TIDAL_AVERAGE, WIND_AVERAGE, ENERGY_CONVERSION_FLOOR, GameSimulation
+
+DEFAULT_TOLERANCE = 1e-3
+MAX_STEP = 1.0
+ROOT_ITERATIONS = 40
+PROFILE_PERIODS = (37.0, 91.0, 233.0)
+
+UP = 1
+DOWN = -1
+BOTH = 0
+
+
+def _simpson(profile: Callable[[float], float], start: float, end: float) -> float:
+    middle = (start + end) / 2
+    return (end - start) / 6 * (profile(start) + 4 * profile(middle) + profile(end))
+
+
+def random_income_profile(
+    seed: int, average: float = WIND_AVERAGE, variation: float = 6.0
+) -> Callable[[float], float]:
+    """
+    Smooth, reproducible income curve for wind or tidal generators: the
+    average plus a few sinusoids with random phases, never below zero.
+    """
+    rng = random.Random(seed)
+    phases = [rng.uniform(0, 2 * math.pi) for _ in PROFILE_PERIODS]
+    weights = [rng.uniform(0.5, 1.0) for _ in PROFILE_PERIODS]
+    scale = variation / sum(weights)
+
+    def profile(time: float) -> float:
+        wave = sum(
+            w * math.sin(2 * math.pi * time / period + phase)
+            for w, period, phase in zip(weights, PROFILE_PERIODS, phases)
+        )
+        return max(0.0, average + scale * wave)
+
+    return profile
+
+
+class AdaptiveGameSimulation(GameSimulation):
+    """
+    GameSimulation with a variable time step. Steps grow up to max_step while
+    income is smooth and nothing happens, and end exactly on task completions,
+    scheduler wake-ups and the resource levels where something changes
+    (stall, storage overflow, energy conversion switching, a waiting task
+    becoming sustainable), which are located by bisection. Time-varying income
+    is integrated with Simpson's rule and the step is halved until the
+    estimated error is below tolerance per simulated second. Stalled tasks and
+    dispatch decisions fall back to the base TIME_STEP so tick behaviour is
+    kept where it matters. While energy hovers at an energy converter's
+    threshold, the converters run at the fraction that holds energy level,
+    which is the average of the tick engine switching them every tick.
+    """
+
+    def __init__(
+        self,
+        tasks: list = [],
+        tolerance: float = DEFAULT_TOLERANCE,
+        max_step: float = MAX_STEP,
+        **kwargs,
+    ):
+        super().__init__(tasks, **kwargs)
+        self.tolerance = tolerance
+        self.max_step = max_step
+        self.income_window: tuple[float, float] | None = None
+        self.sliding_conversion_level: float | None = None
+        self.sliding_shifts: list[tuple[float, float]] = []
+        self.max_time: float = math.inf
+        self.steps: int = 0
+
+    def _wind(self, time: float) -> float:
+        return WIND_AVERAGE if self.wind_profile is None else self.wind_profile(time)
+
+    def _tidal(self, time: float) -> float:
+        return TIDAL_AVERAGE if self.tidal_profile is None else self.tidal_profile(time)
+
+    def _income_rates(self) -> tuple[float, float]:
+        if self.income_window is None:
+            return super()._income_rates()
+        start, end = self.income_window
+        return (
+            _simpson(self._wind, start, end) / (end - start),
+            _simpson(self._tidal, start, end) / (end - start),
+        )
+
+    def _conversion_groups(self) -> dict[float, list]:
+        groups: dict[float, list] = {}
+        for unit in self.units:
+            if unit.energy_conversion_capacity > 0 and unit.energy_conversion_efficiency > 0:
+                level = self.max_energy * ENERGY_CONVERSION_FLOOR + unit.energy_conversion_capacity
+                groups.setdefault(level, []).append(unit)
+        return groups
+
+    def _shift_generation(self, energy: float, metal: float):
+        self.energy_generation += energy
+        self.energy_generation_future += energy
+        self.energy_converted -= energy
+        self.metal_generation += metal
+        self.metal_generation_future += metal
+        self.metal_converted += metal
+
+    def calculate_resource_generation(self):
+        super().calculate_resource_generation()
+        self.sliding_conversion_level = None
+        self.sliding_shifts = []
+        if any(task.current_status == "STALLED" for task in self.task_in_progress):
+            return
+        energy_demand = sum(t.energy_cost_per_second for t in self.task_in_progress)
+        for level, converters in self._conversion_groups().items():
+            capacity = sum(u.energy_conversion_capacity for u in converters)
+            if abs(self.energy - level) > 2 * capacity * self.TIME_STEP:
+                continue
+            metal_made = sum(
+                u.energy_conversion_capacity * u.energy_conversion_efficiency
+                for u in converters
+            )
+            converting = self.energy > level
+            energy_off = self.energy_generation + (capacity if converting else 0)
+            net_off = energy_off - energy_demand
+            if not 0 < net_off < capacity:
+                continue
+            # The tick engine switches these converters on and off every tick
+            # and keeps energy at the threshold; run them at the fraction that
+            # holds energy level instead.
+            fraction = net_off / capacity
+            on = 1 if converting else 0
+            self._shift_generation((on - fraction) * capacity, (fraction - on) * metal_made)
+            self.sliding_conversion_level = level
+            # Shifts from the sliding rates to the converters being off and on,
+            # the two states the tick engine sees when it decides per tick.
+            self.sliding_shifts = [
+                (fraction * capacity, -fraction * metal_made),
+                ((fraction - 1) * capacity, (1 - fraction) * metal_made),
+            ]
+            return
+
+    def _variable_income(self) -> list[tuple[int, Callable[[float], float]]]:
+        wind_units = sum(1 for unit in self.units if unit.energy_generation_wind > 0)
+        tidal_units = sum(1 for unit in self.units if unit.energy_generation_tidal > 0)
+        return [(wind_units, self._wind), (tidal_units, self._tidal)]
+
+    def _dispatch_state(self) -> tuple:
+        waiting = sum(
+            1
+            for task in self.tasks
+            if task.waiting_for_builders or task.waiting_for_dependencies
+        )
+        return len(self.tasks), waiting
+
+    def _dispatch(self) -> bool:
+        if not self.sliding_shifts:
+            return self.check_tasks()
+        # The tick engine switches sliding converters every tick, so a task
+        # starts as soon as it is sustainable with them either off or on.
+        dispatch_state = self._dispatch_state()
+        for energy_shift, metal_shift in self.sliding_shifts:
+            self._shift_generation(energy_shift, metal_shift)
+            if self.scheduler is not None:
+                self.scheduler.notify()
+            x = self.check_tasks()
+            self._shift_generation(-energy_shift, -metal_shift)
+            if not x or dispatch_state != self._dispatch_state():
+                return x
+        return x
+
+    def _error_controlled_step(self, step: float) -> float:
+        income = [(count, profile) for count, profile in self._variable_income() if count]
+        while step > self.TIME_STEP:
+            error = 0.0
+            for count, profile in income:
+                whole = _simpson(profile, self.time, self.time + step)
+                middle = self.time + step / 2
+                halves = _simpson(profile, self.time, middle) + _simpson(
+                    profile, middle, self.time + step
+                )
+                error += count * abs(halves - whole) / 15
+            if error <= self.tolerance * step:
+                break
+            step /= 2
+        return step
+
+    def _sustainability_gaps(
+        self,
+        energy_at: Callable[[float], float],
+        metal_at: Callable[[float], float],
+        income_change: Callable[[float], float],
+    ) -> list[Callable[[float], float]]:
+        """
+        Stored minus needed resources, as functions of the offset into the
+        step, for every task that only waits for resources. A task becomes
+        sustainable where both turn positive. The energy needed follows the
+        variable income through the step, and while converters slide it is
+        checked with them off and on, as the tick engine does.
+        """
+        gaps = []
+        for task in self.tasks:
+            if task.waiting_for_builders or task.waiting_for_dependencies:
+                continue
+            builders = self.obtain_builders_reference(task.builders)
+            if len(builders) != len(task.builders) or not all(b.idle for b in builders):
+                continue
+            time_to_complete, energy_per_second, metal_per_second = (
+                self.task_resource_rates(task, builders)
+            )
+            for energy_shift, metal_shift in self.sliding_shifts or [(0.0, 0.0)]:
+                energy_future = self.energy_generation_future + energy_shift
+                metal_needed = (
+                    metal_per_second - self.metal_generation_future - metal_shift
+                ) * time_to_complete
+                # Storage caps what can be stored, so a need above it is never met.
+                gaps.append(
+                    lambda offset, future=energy_future, rate=energy_per_second, duration=time_to_complete: (
+                        min(energy_at(offset), self.max_energy)
+                        - (rate - future - income_change(offset)) * duration
+                    )
+                )
+                gaps.append(
+                    lambda offset, needed=metal_needed: min(metal_at(offset), self.max_metal)
+                    - needed
+                )
+        return gaps
+
+    def _limit_to_crossings(self, step: float) -> float:
+        income = self._variable_income()
+        fixed_energy = self.energy_generation - sum(
+            count * profile(self.time) for count, profile in income
+        )
+        energy_demand = sum(t.energy_cost_per_second for t in self.task_in_progress)
+        metal_demand = sum(t.metal_cost_per_second for t in self.task_in_progress)
+
+        def energy_at(offset: float) -> float:
+            if self.sliding_conversion_level is not None:
+                return self.energy
+            stored = self.energy + (fixed_energy - energy_demand) * offset
+            if offset > 0:
+                for count, profile in income:
+                    if count:
+                        stored += count * _simpson(profile, self.time, self.time + offset)
+            return stored
+
+        def metal_at(offset: float) -> float:
+            return self.metal + (self.metal_generation - metal_demand) * offset
+
+        def income_change(offset: float) -> float:
+            return sum(
+                count * (profile(self.time + offset) - profile(self.time))
+                for count, profile in income
+                if count
+            )
+
+        def gap(stored_at: Callable[[float], float], level: float) -> Callable[[float], float]:
+            return lambda offset: stored_at(offset) - level
+
+        # After a tick at full storage the tasks have already taken their share,
+        # so storage counts as full one tick of demand below the maximum.
+        crossings = [
+            (gap(energy_at, self.max_energy - energy_demand * self.TIME_STEP * 1.01), UP),
+            (gap(metal_at, self.max_metal - metal_demand * self.TIME_STEP * 1.01), UP),
+        ]
+        if energy_demand > 0:
+            crossings.append((gap(energy_at, 0.0), DOWN))
+        if metal_demand > 0:
+            crossings.append((gap(metal_at, 0.0), DOWN))
+        for level in self._conversion_groups():
+            if level != self.sliding_conversion_level:
+                crossings.append((gap(energy_at, level), BOTH))
+        if self.sliding_shifts:
+            # Sliding holds while the converters take part of the surplus, so
+            # it ends where varying income makes the surplus leave that range.
+            (surplus, _), (short, _) = self.sliding_shifts
+            crossings.append((lambda offset: surplus + income_change(offset), DOWN))
+            crossings.append((lambda offset: -short - income_change(offset), DOWN))
+        crossings += [
+            (sustainability, UP)
+            for sustainability in self._sustainability_gaps(energy_at, metal_at, income_change)
+        ]
+
+        for gap_at, direction in crossings:
+            before = gap_at(0.0)
+            after = gap_at(step)
+            if direction == UP and not (before < 0 < after):
+                continue
+            if direction == DOWN and not (before > 0 > after):
+                continue
+            if direction == BOTH and not (before * after < 0):
+                continue
+            low, high = 0.0, step
+            for _ in range(ROOT_ITERATIONS):
+                if high - low <= self.TIME_STEP / 10:
+                    break
+                middle = (low + high) / 2
+                if gap_at(middle) * before > 0:
+                    low = middle
+                else:
+                    high = middle
+            # Stop just before running dry so the step stays affordable, and
+            # just past any other level so the change is seen next step.
+            step = low if direction == DOWN else high
+        return step
+
+    def _choose_step(self) -> float:
+        if any(task.current_status == "STALLED" for task in self.task_in_progress):
+            return self.TIME_STEP
+        step = self._error_controlled_step(min(self.max_step, self.max_time - self.time))
+        for task in self.task_in_progress:
+            step = min(
+                step,
+                (1 - task.progress)
+                * task.total_construction_power_needed
+                / task.total_construction_power_available,
+            )
+        if self.scheduler is not None and self.scheduler.wake_time > self.time:
+            step = min(step, self.scheduler.wake_time - self.time)
+        step = self._limit_to_crossings(step)
+        return max(step, self.TIME_STEP)
+
+    def apply_resource_generation(self):
+        if self.time_step <= self.TIME_STEP:
+            return super().apply_resource_generation()
+        # Nothing stalls during a long step, so the tasks consume their full
+        # rate and only the net inflow can overflow the storage.
+        energy_demand = sum(t.energy_cost_per_second for t in self.task_in_progress)
+        metal_demand = sum(t.metal_cost_per_second for t in self.task_in_progress)
+        energy_cap = self.max_energy + energy_demand * self.time_step
+        metal_cap = self.max_metal + metal_demand * self.time_step
+        self.energy += self.energy_generation * self.time_step
+        self.metal += self.metal_generation * self.time_step
+        if self.energy > energy_cap:
+            self.total_energy_lost += self.energy - energy_cap
+            self.energy = energy_cap
+        if self.metal > metal_cap:
+            self.total_metal_lost += self.metal - metal_cap
+            self.metal = metal_cap
+
+    def complete_task(self, task):
+        # The tick engine stamps a completion with the start of its last tick,
+        # so a long step is stamped at its last tick as well.
+        step_start = self.time
+        self.time += self.time_step - self.TIME_STEP
+        super().complete_task(task)
+        self.time = step_start
+
+    def run(self, max_time: int = 300, reject_hopeless: bool = False) -> bool:
+        self.max_time = max_time
+        return super().run(max_time=max_time, reject_hopeless=reject_hopeless)
+
+    def simulate_step(self):
+        self.time_step = self.TIME_STEP
+        self.income_window = None
+        self.calculate_resource_storage()
+        self.calculate_resource_generation()
+        dispatch_state = self._dispatch_state()
+        x = self._dispatch()
+        if x and dispatch_state == self._dispatch_state():
+            self.time_step = self._choose_step()
+        if self.time_step > self.TIME_STEP:
+            self.income_window = (self.time, self.time + self.time_step)
+            self.calculate_resource_generation()
+        self.apply_resource_generation()
+        self.work_on_tasks()
+        self.time += self.time_step
+        self.steps += 1
+        return x
@@ -0,0 +1,109 @@
+import math
+
+from unit_index import UnitIndex
+
+
+class BuildGraph:
+    """
+    Dependency graph over the tasks of a build order. Every unit a task names
+    as a builder or dependency must be a starting unit or be produced by some
+    other task; when several tasks produce it they are alternatives and the
+    earliest one to finish counts. Every task must be reachable this way, so
+    a cycle is only an error when no choice of producers breaks it. When a
+    unit index is given and a task's builders have known build options, at
+    least one of them must be able to build the task's unit; the others assist.
+    """
+
+    def __init__(
+        self,
+        tasks: list,
+        units_data: dict,
+        starting_units: list[str],
+        unit_index: UnitIndex | None = None,
+    ):
+        self.tasks = tasks
+        self.units_data = units_data
+        self.starting_units = starting_units
+        self.unit_index = unit_index
+        self.producers: dict[str, list[int]] = {}
+        self.needs: list[set[str]] = []
+        self.finish: list[float] = []
+        self._build()
+
+    def _build(self):
+        for index, task in enumerate(self.tasks):
+            if task.name not in self.units_data:
+                raise ValueError(f"Unknown unit {task.name} in build order.")
+            for builder in task.builders:
+                if builder not in self.units_data:
+                    raise ValueError(f"Unknown builder {builder} for task {task.name}.")
+            if self.unit_index is not None and any(
+                self.unit_index.has_build_options(b) for b in task.builders
+            ):
+                if not any(self.unit_index.can_build(b, task.name) for b in task.builders):
+                    raise ValueError(
+                        f"None of the builders {task.builders} can build {task.name}."
+                    )
+            self.producers.setdefault(task.name, []).append(index)
+
+        for index, task in enumerate(self.tasks):
+            needs = (set(task.builders) | set(task.dependencies)) - set(self.starting_units)
+            for unit_name in needs:
+                if not any(i != index for i in self.producers.get(unit_name, [])):
+                    raise ValueError(
+                        f"Task {task.name} needs {unit_name}, which no task in the build order produces."
+                    )
+            self.needs.append(needs)
+
+        reachable, self.finish = self._relax()
+        if not all(reachable):
+            cyclic = sorted({self.tasks[i].name for i, r in enumerate(reachable) if not r})
+            raise ValueError(f"Build order has a dependency cycle between {cyclic}.")
+
+    def _relax(self) -> tuple[list[bool], list[float]]:
+        """
+        Earliest finish time of every task, assuming unlimited resources and
+        that builders can work on any number of tasks at once. A needed unit is
+        ready when the first of its producers (other than the task itself)
+        finishes. Finish times only decrease, so repeated passes reach a
+        fixpoint; tasks still unreachable then depend on a cycle.
+        """
+        reachable = [False] * len(self.tasks)
+        finish = [math.inf] * len(self.tasks)
+        changed = True
+        while changed:
+            changed = False
+            for index, task in enumerate(self.tasks):
+                start = 0.0
+                for unit_name in self.needs[index]:
+                    ready = [
+                        finish[p]
+                        for p in self.producers[unit_name]
+                        if p != index and reachable[p]
+                    ]
+                    if not ready:
+                        break
+                    start = max(start, min(ready))
+                else:
+                    candidate = start + self.task_duration(task)
+                    if not reachable[index] or candidate < finish[index]:
+                        reachable[index] = True
+                        finish[index] = candidate
+                        changed = True
+        return reachable, finish
+
+    def task_duration(self, task) -> float:
+        build_power = sum(
+            self.units_data[builder]["unit"]["buildPower"] for builder in task.builders
+        )
+        if build_power <= 0:
+            return float("inf")
+        return self.units_data[task.name]["unit"]["buildTime"] / build_power
+
+    def critical_path_lower_bound(self) -> float:
+        """
+        Earliest possible completion time of the whole build order, assuming
+        unlimited resources and that builders can work on any number of tasks
+        at once. Only the build time of the longest dependency chain remains.
+        """
+        return max(self.finish, default=0.0)
@@ -0,0 +1,376 @@
+import argparse
+import logging
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+FIXTURE_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "unit_data_fixture.json")
+os.environ.setdefault("BAR_UNITS_DATA", FIXTURE_FILE)
+
+from main import (
+    STARTING_UNITS,
+    TIDAL_AVERAGE,
+    UNIT_INDEX,
+    UNITS_DATA,
+    WIND_AVERAGE,
+    GameSimulation,
+    create_task_list_from_recipe,
+)
+from adaptive_simulation import AdaptiveGameSimulation, random_income_profile
+from scheduler import PRIORITY, Scheduler
+
+MAX_TIME = 300
+TIME_TOLERANCE = 0.05
+RESOURCE_TOLERANCE = 1.0
+MAX_RECIPE_STEPS = 8
+MAX_REPEAT = 3
+MAX_RANDOM_METAL_COST = 1000
+MAX_PRIORITY = 3
+DEPENDENCY_CHANCE = 0.3
+PRIORITY_CHANCE = 0.3
+VARIABLE_INCOME_CHANCE = 0.5
+
+
+def reference_engine(tasks: list, **profiles) -> GameSimulation:
+    return GameSimulation(tasks=tasks, **profiles)
+
+
+def scheduler_engine(tasks: list, **profiles) -> GameSimulation:
+    return GameSimulation(tasks=tasks, scheduler=Scheduler(policy=PRIORITY), **profiles)
+
+
+def adaptive_engine(tasks: list, **profiles) -> GameSimulation:
+    return AdaptiveGameSimulation(tasks=tasks, **profiles)
+
+
+ENGINES = {
+    "reference": reference_engine,
+    "scheduler": scheduler_engine,
+    "adaptive": adaptive_engine,
+}
+# The reference starts tasks in list order, so for these engines it runs the
+# recipe sorted by step priority instead.
+PRIORITY_ORDERED = {"scheduler"}
+# The reference ends the run at the first task it cannot afford while storage
+# is full and nothing is building; these engines skip that task by design and
+# are only compared up to that point.
+SKIPS_UNAFFORDABLE = {"scheduler"}
+
+TOTALS = (
+    "time",
+    "energy",
+    "metal",
+    "max_energy",
+    "max_metal",
+    "total_energy_spent",
+    "total_metal_spent",
+    "total_energy_lost",
+    "total_metal_lost",
+)
+
+
+def _affordable(name: str) -> bool:
+    unit = UNITS_DATA[name]["unit"]
+    return 0 < unit["buildTime"] and unit["metalCost"] <= MAX_RANDOM_METAL_COST
+
+
+def random_recipe(rng: random.Random) -> list:
+    """
+    Random build order over the loaded unit database. Builders are only taken
+    from the starting units and units built by earlier steps, and when the
+    unit index knows a builder's options the unit is picked from them, so
+    every recipe passes the build graph validation.
+    """
+    any_unit = sorted(name for name in UNITS_DATA if _affordable(name))
+    builders = list(STARTING_UNITS)
+    produced = []
+    recipe = []
+    for _ in range(rng.randint(1, MAX_RECIPE_STEPS)):
+        primaries = [b for b in builders if UNIT_INDEX.has_build_options(b)]
+        builder = rng.choice(primaries or builders)
+        if UNIT_INDEX.has_build_options(builder):
+            options = sorted(n for n in UNIT_INDEX.buildables(builder) if _affordable(n))
+        else:
+            options = any_unit
+        if not options:
+            continue
+        name = rng.choice(options)
+        step_builders = [builder]
+        assistants = [b for b in builders if b != builder]
+        if assistants and rng.random() < 0.5:
+            step_builders.append(rng.choice(assistants))
+        step = (name, step_builders, rng.randint(1, MAX_REPEAT))
+        dependencies = []
+        built = sorted(set(produced) - {name})
+        if built and rng.random() < DEPENDENCY_CHANCE:
+            dependencies = [rng.choice(built)]
+        if rng.random() < PRIORITY_CHANCE:
+            step += (dependencies, rng.randint(1, MAX_PRIORITY))
+        elif dependencies:
+            step += (dependencies,)
+        recipe.append(step)
+        produced.append(name)
+        if UNITS_DATA[name]["unit"]["buildPower"] > 0 and name not in builders:
+            builders.append(name)
+    return recipe
+
+
+def random_income(rng: random.Random) -> dict:
+    """
+    Seeds for time-varying wind and tidal income, or None to keep the
+    average, so both the constant and the varying income paths are checked.
+    """
+    return {
+        "wind_seed": rng.randrange(2**31) if rng.random() < VARIABLE_INCOME_CHANCE else None,
+        "tidal_seed": rng.randrange(2**31) if rng.random() < VARIABLE_INCOME_CHANCE else None,
+    }
+
+
+def income_profiles(income: dict | None) -> dict:
+    income = income or {}
+    profiles = {}
+    if income.get("wind_seed") is not None:
+        profiles["wind_profile"] = random_income_profile(income["wind_seed"], WIND_AVERAGE)
+    if income.get("tidal_seed") is not None:
+        profiles["tidal_profile"] = random_income_profile(income["tidal_seed"], TIDAL_AVERAGE)
+    return profiles
+
+
+def _priority(step: tuple) -> int:
+    return step[4] if len(step) > 4 else 0
+
+
+def run_engine(
+    engine: str,
+    recipe: list,
+    max_time: int = MAX_TIME,
+    income: dict | None = None,
+    by_priority: bool = False,
+) -> dict:
+    """
+    Runs the recipe through an engine. With by_priority the steps are run in
+    priority order, but the task results are still reported in recipe order.
+    """
+    steps = list(range(len(recipe)))
+    if by_priority:
+        steps.sort(key=lambda i: -_priority(recipe[i]))
+    tasks = create_task_list_from_recipe([recipe[i] for i in steps])
+    step_of_task = [i for i in steps for _ in range(recipe[i][2])]
+    all_tasks = [task for _, task in sorted(zip(step_of_task, tasks), key=lambda x: x[0])]
+    game = ENGINES[engine](tasks, **income_profiles(income))
+    try:
+        game.run(max_time=max_time)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    result = {
+        "error": None,
+        "tasks": [],
+        "gave_up": bool(game.tasks)
+        and not game.task_in_progress
+        and game.energy == game.max_energy
+        and game.metal == game.max_metal,
+    }
+    for total in TOTALS:
+        result[total] = getattr(game, total)
+    for task in all_tasks:
+        result["tasks"].append(
+            {
+                "completed": task.completed,
+                "completion_time": task.completion_time,
+                "status_history": list(task.status_history),
+            }
+        )
+    return result
+
+
+def settled_history(history: list[tuple], time_tolerance: float = TIME_TOLERANCE) -> list[tuple]:
+    """
+    Status history without statuses held for no longer than time_tolerance,
+    such as a task flickering between STALLED and WORKING every tick while
+    it runs dry. Repeated statuses left behind are merged.
+    """
+    settled = []
+    ends = [time for time, _ in history[1:]] + [math.inf]
+    for (time, status), end in zip(history, ends):
+        if end - time <= time_tolerance:
+            continue
+        if settled and settled[-1][1] == status:
+            continue
+        settled.append((time, status))
+    return settled
+
+
+def compare_runs(
+    reference: dict,
+    candidate: dict,
+    time_tolerance: float = TIME_TOLERANCE,
+    resource_tolerance: float = RESOURCE_TOLERANCE,
+    partial: bool = False,
+) -> list[str]:
+    """
+    Differences between two runs. With partial only the tasks the reference
+    completed are compared, for runs the reference ended early by design.
+    """
+    if reference["error"] or candidate["error"]:
+        # Both engines failing only counts as agreement when they fail with
+        # the same exception type and message.
+        if reference["error"] == candidate["error"]:
+            return []
+        return [f"error: reference {reference['error']}, candidate {candidate['error']}"]
+
+    mismatches = []
+    for total in () if partial else TOTALS:
+        tolerance = time_tolerance if total == "time" else resource_tolerance
+        if abs(reference[total] - candidate[total]) > tolerance:
+            mismatches.append(f"{total}: {reference[total]:.3f} != {candidate[total]:.3f}")
+
+    for index, (ref_task, cand_task) in enumerate(zip(reference["tasks"], candidate["tasks"])):
+        if partial and not ref_task["completed"]:
+            continue
+        if ref_task["completed"] != cand_task["completed"]:
+            mismatches.append(
+                f"task {index} completed: {ref_task['completed']} != {cand_task['completed']}"
+            )
+            continue
+        if abs(ref_task["completion_time"] - cand_task["completion_time"]) > time_tolerance:
+            mismatches.append(
+                f"task {index} completion time: {ref_task['completion_time']:.3f} != {cand_task['completion_time']:.3f}"
+            )
+        ref_history = settled_history(ref_task["status_history"], time_tolerance)
+        cand_history = settled_history(cand_task["status_history"], time_tolerance)
+        if [s for _, s in ref_history] != [s for _, s in cand_history]:
+            mismatches.append(
+                f"task {index} status transitions: {[s for _, s in ref_history]} != {[s for _, s in cand_history]}"
+            )
+            continue
+        for (ref_time, status), (cand_time, _) in zip(ref_history, cand_history):
+            if abs(ref_time - cand_time) > time_tolerance:
+                mismatches.append(
+                    f"task {index} {status} at {ref_time:.3f} != {cand_time:.3f}"
+                )
+                break
+    return mismatches
+
+
+def check_recipe(
+    recipe: list,
+    candidate: str,
+    max_time: int = MAX_TIME,
+    income: dict | None = None,
+    **tolerances,
+) -> list[str]:
+    reference = run_engine(
+        "reference", recipe, max_time, income, by_priority=candidate in PRIORITY_ORDERED
+    )
+    result = run_engine(candidate, recipe, max_time, income)
+    partial = (
+        candidate in SKIPS_UNAFFORDABLE
+        and not reference["error"]
+        and reference["gave_up"]
+        and not result["error"]
+        and not result["gave_up"]
+    )
+    return compare_runs(reference, result, partial=partial, **tolerances)
+
+
+def _smaller_recipes(recipe: list):
+    for index in range(len(recipe)):
+        yield recipe[:index] + recipe[index + 1:]
+    for index, (name, builders, repeat, *extra) in enumerate(recipe):
+        if repeat > 1:
+            yield recipe[:index] + [(name, builders, 1, *extra)] + recipe[index + 1:]
+        if len(builders) > 1:
+            for builder in builders:
+                step = (name, [builder], repeat, *extra)
+                yield recipe[:index] + [step] + recipe[index + 1:]
+        if extra:
+            yield recipe[:index] + [(name, builders, repeat)] + recipe[index + 1:]
+
+
+def shrink_recipe(
+    recipe: list,
+    candidate: str,
+    max_time: int = MAX_TIME,
+    income: dict | None = None,
+    **tolerances,
+) -> list:
+    """
+    Greedily removes steps, lowers repeat counts and drops builders,
+    dependencies and priorities while the candidate still disagrees with the
+    reference. The income profiles are kept.
+    """
+    improved = True
+    while improved:
+        improved = False
+        for smaller in _smaller_recipes(recipe):
+            if not smaller:
+                continue
+            try:
+                mismatches = check_recipe(smaller, candidate, max_time, income, **tolerances)
+            except ValueError:
+                continue
+            if mismatches:
+                recipe = smaller
+                improved = True
+                break
+    return recipe
+
+
+def check_case(args: tuple) -> tuple:
+    seed, candidate, max_time, tolerances = args
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(seed)
+    recipe = random_recipe(rng)
+    income = random_income(rng)
+    mismatches = check_recipe(recipe, candidate, max_time, income, **tolerances)
+    if mismatches:
+        recipe = shrink_recipe(recipe, candidate, max_time, income, **tolerances)
+        mismatches = check_recipe(recipe, candidate, max_time, income, **tolerances)
+    return seed, recipe, income, mismatches
+
+
+def run_harness(
+    candidate: str,
+    cases: int,
+    seed: int = 0,
+    max_time: int = MAX_TIME,
+    processes: int | None = None,
+    time_tolerance: float = TIME_TOLERANCE,
+    resource_tolerance: float = RESOURCE_TOLERANCE,
+) -> list[tuple]:
+    tolerances = {"time_tolerance": time_tolerance, "resource_tolerance": resource_tolerance}
+    jobs = [(seed + i, candidate, max_time, tolerances) for i in range(cases)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(check_case, jobs))
+    return [result for result in results if result[3]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare a candidate engine against the reference tick engine on random build orders."
+    )
+    parser.add_argument("--candidate", default="scheduler", choices=[e for e in ENGINES if e != "reference"])
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-time", type=int, default=MAX_TIME)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--resource-tolerance", type=float, default=RESOURCE_TOLERANCE)
+    args = parser.parse_args()
+
+    print(f"--- Checking {args.cases} random build orders against {args.candidate} ---")
+    failures = run_harness(
+        args.candidate,
+        args.cases,
+        seed=args.seed,
+        max_time=args.max_time,
+        processes=args.processes,
+        time_tolerance=args.time_tolerance,
+        resource_tolerance=args.resource_tolerance,
+    )
+    for seed, recipe, income, mismatches in failures:
+        print(f"\nSeed {seed} fails, minimal recipe: {recipe}, income: {income}")
+        for mismatch in mismatches:
+            print(f"  - {mismatch}")
+    print(f"\n--- {len(failures)} of {args.cases} build orders differ. ---")
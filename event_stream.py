@@ -0,0 +1,75 @@
+import json
+import logging
+
+EVENTS_FILE_SUFFIX = "_events.jsonl"
+FLUSH_EVERY = 64
+
+TASK_STARTED = "task_started"
+TASK_STATUS = "task_status"
+TASK_COMPLETED = "task_completed"
+TIMELINE = "timeline"
+
+
+class EventStream:
+    """
+    Appends simulation events to a JSONL file, one JSON object per line.
+    Events are buffered and written in batches so a long run keeps a bounded
+    amount of history in memory while other tools can tail the file.
+    """
+
+    def __init__(self, path: str, flush_every: int = FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer: list[str] = []
+        self.events_written: int = 0
+        self.file = open(path, "w")
+
+    def emit(self, event: str, time: float, **fields):
+        record = {"event": event, "time": time}
+        record.update(fields)
+        self.buffer.append(json.dumps(record))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.file.write("\n".join(self.buffer) + "\n")
+        self.file.flush()
+        self.events_written += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        logging.info(f"Wrote {self.events_written} events to {self.path}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_events(path: str, event: str | None = None):
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if event is None or record["event"] == event:
+                yield record
+
+
+def write_cookbook(events_path: str, cookbook_path: str):
+    with open(cookbook_path, "w") as file:
+        for record in read_events(events_path, TASK_STARTED):
+            builders_str = "\n".join(
+                f"  - ID: {b['id']}, Name: {b['name']}" for b in record["builders"]
+            )
+            file.write(
+                f"{record['time']:.1f}: task {record['task']} started with builders:\n{builders_str}\n\n"
+            )
@@ -1,10 +1,23 @@
 import logging
-import pandas as pd
 import math
-import matplotlib.pyplot as plt
 import json
+import os
+from typing import Callable
 
 from unit_data_transformer import OUTPUT_FILE
+from build_graph import BuildGraph
+from scheduler import LOOKAHEAD, Scheduler
+from unit_index import UnitIndex
+from event_stream import (
+    EVENTS_FILE_SUFFIX,
+    TASK_COMPLETED,
+    TASK_STARTED,
+    TASK_STATUS,
+    TIMELINE,
+    EventStream,
+    write_cookbook,
+)
+from report import render_report, render_reports
 
 logging.basicConfig(
     filename="simulationV2_log.txt",
@@ -14,14 +27,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+UNITS_DATA_FILE = os.environ.get("BAR_UNITS_DATA", OUTPUT_FILE)
 UNITS_DATA = {}
-with open(OUTPUT_FILE, "r") as data:
+with open(UNITS_DATA_FILE, "r") as data:
     UNITS_DATA = json.load(data)
+UNIT_INDEX = UnitIndex.load(UNITS_DATA_FILE, UNITS_DATA)
 
 TIDAL_AVERAGE = 14
 WIND_AVERAGE = 14
 METAL_SPOT_VALUE = 2.3
 ENERGY_CONVERSION_FLOOR = 0.2
+STARTING_UNITS = ["armcom"]
 
 class Unit:
     _id_counter = 0
@@ -59,14 +75,28 @@ class Unit:
 
 
 class Task:
-    def __init__(self, name: str, builders: list[str], action: str):
+    _id_counter = 0
+
+    def __init__(
+        self,
+        name: str,
+        builders: list[str],
+        action: str,
+        dependencies: list[str] | None = None,
+        priority: int = 0,
+    ):
+        self.id = Task._id_counter
+        Task._id_counter += 1
         self.name = name
         self.action = action
         self.builders = builders
+        self.dependencies: list[str] = dependencies or []
+        self.priority: int = priority
         self.progress: float = 0.0
         self.started: bool = False
         self.completed: bool = False
         self.waiting_for_builders: bool = False
+        self.waiting_for_dependencies: bool = False
         self.builders_ref: list[Unit] = []
         self.builders_str: str = ""
         self.total_construction_power_needed: int = 0
@@ -118,18 +148,41 @@ class Task:
         return True
 
 
+class TaskList(list):
+    """
+    Tasks of a build order together with the dependency graph they were
+    validated against, so a simulation can reuse it instead of rebuilding it.
+    """
+
+    def __init__(self, tasks: list[Task], build_graph: BuildGraph):
+        super().__init__(tasks)
+        self.build_graph: BuildGraph = build_graph
+
+
 class GameSimulation:
     TIME_STEP = 0.001
     PRINT_INTERVAL = 1
 
-    def __init__(self, tasks: list[Task] = []):
+    def __init__(
+        self,
+        tasks: list[Task] = [],
+        event_stream: EventStream | None = None,
+        scheduler: Scheduler | None = None,
+        wind_profile: Callable[[float], float] | None = None,
+        tidal_profile: Callable[[float], float] | None = None,
+    ):
         self.time: float = 0.0
+        self.time_step: float = self.TIME_STEP
+        self.wind_profile: Callable[[float], float] | None = wind_profile
+        self.tidal_profile: Callable[[float], float] | None = tidal_profile
         self.energy_generation: float = 0
         self.metal_generation: float = 0
         self.energy_consumption: float = 0
         self.metal_consumption: float = 0
         self.energy_generation_future: float = 0
         self.metal_generation_future: float = 0
+        self.energy_converted: float = 0
+        self.metal_converted: float = 0
         self.energy: float = 1000
         self.metal: float = 1000
         self.max_energy: int = 1000
@@ -147,12 +200,21 @@ class GameSimulation:
         self.tasks_done: int = 0
         self.last_print_time: int = -1
         self.print_state_next: bool = False
-        self.cookbook: str = ""
+        self.event_stream: EventStream | None = event_stream
+        self.scheduler: Scheduler | None = scheduler
         self.timeline_data: list[dict] = []
         self.idle_construction_power: int = 0
         self.total_construction_power: int = 0
+        if isinstance(tasks, TaskList):
+            self.build_graph: BuildGraph = tasks.build_graph
+        else:
+            self.build_graph = BuildGraph(tasks, UNITS_DATA, STARTING_UNITS, UNIT_INDEX)
+        self.critical_path_lower_bound: float = (
+            self.build_graph.critical_path_lower_bound()
+        )
         # -----------------------------
-        self.units.append(Unit("armcom"))
+        for unit_name in STARTING_UNITS:
+            self.units.append(Unit(unit_name))
 
     def check_builders_availability(
         self, task: Task, builders: list[Unit]
@@ -164,10 +226,15 @@ class GameSimulation:
             logging.info(f"All builders are idle for task {task.name}.")
         return True
 
-    def obtain_builders_reference(self, builders: list[str]) -> list[Unit]:
+    def obtain_builders_reference(
+        self, builders: list[str], prefer_idle: bool = False
+    ) -> list[Unit]:
         builders_copy = builders.copy()
         result: list[Unit] = []
-        for unit in self.units:
+        units = self.units
+        if prefer_idle:
+            units = sorted(self.units, key=lambda unit: not unit.idle)
+        for unit in units:
             for unit_name in builders_copy:
                 if unit.name_definition == unit_name:
                     builders_copy.remove(unit_name)
@@ -183,12 +250,14 @@ class GameSimulation:
                 self.idle_construction_power += unit.build_power
         return
 
-    def can_build_sustainable(self, task: Task, builders: list[Unit]) -> bool:
-        buildable: Unit = Unit(task.name)
+    def task_resource_rates(
+        self, task: Task, builders: list[Unit]
+    ) -> tuple[float, float, float]:
+        buildable: dict = UNITS_DATA[task.name]["unit"]
         total_construction_power_available: int = 0
-        total_construction_power_needed: int = buildable.build_cost
-        total_energy_needed: int = buildable.energy_cost
-        total_metal_needed: int = buildable.metal_cost
+        total_construction_power_needed: int = buildable["buildTime"]
+        total_energy_needed: int = buildable["energyCost"]
+        total_metal_needed: int = buildable["metalCost"]
         for builder in builders:
             total_construction_power_available += builder.build_power
         time_to_complete: float = (
@@ -196,6 +265,12 @@ class GameSimulation:
         )
         energy_cost_per_second: float = total_energy_needed / time_to_complete
         metal_cost_per_second: float = total_metal_needed / time_to_complete
+        return time_to_complete, energy_cost_per_second, metal_cost_per_second
+
+    def can_build_sustainable(self, task: Task, builders: list[Unit]) -> bool:
+        time_to_complete, energy_cost_per_second, metal_cost_per_second = (
+            self.task_resource_rates(task, builders)
+        )
         energy_generation_during_task = (
             self.energy_generation_future - energy_cost_per_second
         )
@@ -232,18 +307,39 @@ class GameSimulation:
                 return False
 
     def have_dependencies(self, task: Task) -> bool:
-        return True
-
-    def start_task(self, task: Task) -> bool:
-        task.start(self.obtain_builders_reference(task.builders))
+        built = {unit.name_definition for unit in self.units}
+        return all(dependency in built for dependency in task.dependencies)
+
+    def start_task(self, task: Task, builders: list[Unit] | None = None) -> bool:
+        if builders is None:
+            builders = self.obtain_builders_reference(task.builders)
+        task.start(builders)
+        self.energy_generation_future -= task.energy_cost_per_second
+        self.metal_generation_future -= task.metal_cost_per_second
         task.start_time = self.time
         task.current_status = "WORKING"
-        task.status_history.append((self.time, "WORKING"))
+        self._record_status(task, "WORKING")
         self.task_in_progress.append(task)
         self.tasks.remove(task)
-        self.cookbook += f"{self.time:.1f}: task {task.name} started with builders:\n{task.builders_str}\n\n"
+        self._emit_event(
+            TASK_STARTED,
+            task_id=task.id,
+            task=task.name,
+            display_name=task.display_name,
+            builders=[{"id": b.id, "name": b.name} for b in task.builders_ref],
+        )
         return True
 
+    def _record_status(self, task: Task, status: str):
+        # With an event stream attached the history is in the stream; keeping
+        # it on the task as well would grow with every stall until the end.
+        if self.event_stream is None:
+            task.status_history.append((self.time, status))
+
+    def _emit_event(self, event: str, **fields):
+        if self.event_stream is not None:
+            self.event_stream.emit(event, self.time, **fields)
+
     def work_on_tasks(self):
         if not self.task_in_progress:
             return
@@ -257,7 +353,7 @@ class GameSimulation:
             new_status = ""
 
             progress_this_tick = (
-                task.total_construction_power_available * self.TIME_STEP
+                task.total_construction_power_available * self.time_step
             ) / task.total_construction_power_needed
             if (task.progress + progress_this_tick) > 1.0:
                 progress_this_tick = 1 - task.progress
@@ -270,7 +366,10 @@ class GameSimulation:
 
             if new_status != task.current_status:
                 task.current_status = new_status
-                task.status_history.append((self.time, new_status))
+                self._record_status(task, new_status)
+                self._emit_event(
+                    TASK_STATUS, task_id=task.id, task=task.name, status=new_status
+                )
 
             if new_status == "WORKING":
                 self.energy -= energy_needed
@@ -292,7 +391,13 @@ class GameSimulation:
         task.progress = 1.0
         task.completed = True
         task.completion_time = self.time
-        task.status_history.append((self.time, "COMPLETED"))
+        self._record_status(task, "COMPLETED")
+        self._emit_event(
+            TASK_COMPLETED,
+            task_id=task.id,
+            task=task.name,
+            display_name=task.display_name,
+        )
 
         if task in self.task_in_progress:
             self.task_in_progress.remove(task)
@@ -301,9 +406,13 @@ class GameSimulation:
         for builder in task.builders_ref:
             builder.idle = True
 
+        if self.scheduler is not None:
+            self.scheduler.notify()
+
         for other_task in self.tasks:
             other_task.print_unsustained_message = True
             other_task.waiting_for_builders = False
+            other_task.waiting_for_dependencies = False
 
         new_buildable: Unit = Unit(task.name)
         if new_buildable:
@@ -322,23 +431,35 @@ class GameSimulation:
             self.max_metal += unit.metal_storage
     
     def _process_energy_conversion(self):
+        self.energy_converted = 0
+        self.metal_converted = 0
         for unit in self.units:
             if (unit.energy_conversion_capacity > 0) and (unit.energy_conversion_efficiency > 0) and self.energy > ((self.max_energy * ENERGY_CONVERSION_FLOOR) + unit.energy_conversion_capacity):
                 self.energy_generation -= unit.energy_conversion_capacity
                 self.metal_generation += unit.energy_conversion_capacity * unit.energy_conversion_efficiency
+                self.energy_converted += unit.energy_conversion_capacity
+                self.metal_converted += unit.energy_conversion_capacity * unit.energy_conversion_efficiency
 
 
+    def _income_rates(self) -> tuple[float, float]:
+        wind = WIND_AVERAGE if self.wind_profile is None else self.wind_profile(self.time)
+        tidal = (
+            TIDAL_AVERAGE if self.tidal_profile is None else self.tidal_profile(self.time)
+        )
+        return wind, tidal
+
     def calculate_resource_generation(self):
         self.energy_generation = 0
         self.metal_generation = 0
         self.energy_generation_future = 0
         self.metal_generation_future = 0
         self._process_energy_conversion()
+        wind, tidal = self._income_rates()
         for unit in self.units:
             self.energy_generation += (
                 unit.energy_generation
-                + unit.energy_generation_wind
-                + unit.energy_generation_tidal
+                + (wind if unit.energy_generation_wind > 0 else 0)
+                + (tidal if unit.energy_generation_tidal > 0 else 0)
                 - unit.energy_consumption
             )
             self.metal_generation += unit.metal_generation
@@ -350,8 +471,8 @@ class GameSimulation:
         self.metal_generation_future += self.metal_generation
 
     def apply_resource_generation(self):
-        self.energy += self.energy_generation * self.TIME_STEP
-        self.metal += self.metal_generation * self.TIME_STEP
+        self.energy += self.energy_generation * self.time_step
+        self.metal += self.metal_generation * self.time_step
         if self.energy > self.max_energy:
             self.total_energy_lost += self.energy - self.max_energy
             self.energy = self.max_energy
@@ -375,6 +496,8 @@ class GameSimulation:
         logger.info("-" * 50)
 
     def check_tasks(self):
+        if self.scheduler is not None:
+            return self.scheduler.dispatch(self)
         if len(self.tasks) == 0 and len(self.task_in_progress) == 0:
             logger.info("No tasks to process. Ending simulation.")
             return False
@@ -385,7 +508,14 @@ class GameSimulation:
                 not task.started
                 and not task.completed
                 and not task.waiting_for_builders
+                and not task.waiting_for_dependencies
             ):
+                if not self.have_dependencies(task):
+                    task.waiting_for_dependencies = True
+                    logger.info(
+                        f"Dependencies not built for task {task.name}. Waiting..."
+                    )
+                    return True
                 builders = self.obtain_builders_reference(task.builders)
                 if len(builders) == 0 or len(builders) != len(task.builders):
                     logger.info(
@@ -430,7 +560,10 @@ class GameSimulation:
             "total_construction_power": self.total_construction_power,
             "unit_count": len(self.units),
         }
-        self.timeline_data.append(snapshot)
+        if self.event_stream is not None:
+            self.event_stream.emit(TIMELINE, **snapshot)
+        else:
+            self.timeline_data.append(snapshot)
 
     def simulate_step(self):
         self.calculate_resource_storage()
@@ -438,11 +571,24 @@ class GameSimulation:
         x = self.check_tasks()
         self.apply_resource_generation()
         self.work_on_tasks()
-        self.time += self.TIME_STEP
+        self.time += self.time_step
         return x
 
-    def run(self, max_time: int = 300):
-        logger.info(f"Starting simulation for a max of {max_time} seconds.")
+    def run(self, max_time: int = 300, reject_hopeless: bool = False) -> bool:
+        """
+        Simulates until max_time or until no task can be processed. Returns
+        False without simulating when reject_hopeless is set and the critical
+        path lower bound already exceeds max_time, True otherwise.
+        """
+        logger.info(
+            f"Starting simulation for a max of {max_time} seconds. "
+            f"Critical path lower bound: {self.critical_path_lower_bound:.1f}s."
+        )
+        if reject_hopeless and self.critical_path_lower_bound > max_time:
+            logger.info(
+                "Build order cannot complete within the time limit. Skipping simulation."
+            )
+            return False
         last_log_time = -1
         while self.time < max_time:
             if self.print_state_next:
@@ -459,141 +605,29 @@ class GameSimulation:
             if self.time - self.last_print_time >= self.PRINT_INTERVAL:
                 self.print_status()
                 self.last_print_time = self.time
+        return True
 
 
-def run_and_collect_results(build_name: str, tasks: list, max_time: int) -> dict:
+def run_and_collect_results(
+    build_name: str,
+    tasks: list,
+    max_time: int,
+    scheduler: Scheduler | None = None,
+    render: bool = True,
+) -> dict:
     print(f"\n--- Running Simulation: {build_name} ---")
 
-    game = GameSimulation(tasks=tasks)
-    game.run(max_time=max_time)
-
-    with open(f"{build_name}.txt", "w") as file:
-        file.write(game.cookbook)
-
-    completed_tasks = game.tasks_completed
-    timeline_data = game.timeline_data
-
-    timeline_df = pd.DataFrame(timeline_data)
-
-    fig, axs = plt.subplots(
-        5,
-        1,
-        figsize=(18, 20),
-        sharex=True,
-        gridspec_kw={"height_ratios": [3, 2, 2, 2, 1.5]},
-    )
-
-    if not timeline_df.empty:
-        axs[0].plot(
-            timeline_df["time"],
-            timeline_df["metal"],
-            label="Metal Stored",
-            color="grey",
-            lw=2,
-        )
-        axs[0].plot(
-            timeline_df["time"],
-            timeline_df["energy"],
-            label="Energy Stored",
-            color="gold",
-            lw=2,
-        )
-    axs[0].set_title("Resource Storage Over Time")
-    axs[0].set_ylabel("Amount Stored")
-
-    if not timeline_df.empty:
-        axs[1].plot(
-            timeline_df["time"],
-            timeline_df["net_metal_sec"],
-            label="Net Metal/sec",
-            color="grey",
-            lw=2,
-        )
-        axs[1].plot(
-            timeline_df["time"],
-            timeline_df["net_energy_sec"],
-            label="Net Energy/sec",
-            color="gold",
-            lw=2,
-        )
-    axs[1].axhline(0, color="red", linestyle="--", lw=1)
-    axs[1].set_title("Net Income Over Time")
-    axs[1].set_ylabel("Rate (/sec)")
-
-    if not timeline_df.empty:
-        axs[2].plot(
-            timeline_df["time"],
-            timeline_df["unit_count"],
-            label="Unit Count",
-            color="cyan",
-            lw=2,
-        )
-    axs[2].set_title("Army Size Over Time")
-    axs[2].set_ylabel("Number of Units")
-
-    if not timeline_df.empty:
-        busy_power = (
-            timeline_df["total_construction_power"]
-            - timeline_df["idle_construction_power"]
-        )
-
-        axs[3].stackplot(
-            timeline_df["time"],
-            [busy_power, timeline_df["idle_construction_power"]],
-            labels=["Busy Power", "Idle Power"],
-            colors=["#2ca02c", "#d62728"],
+    events_path = f"{build_name}{EVENTS_FILE_SUFFIX}"
+    with EventStream(events_path) as event_stream:
+        game = GameSimulation(
+            tasks=tasks, event_stream=event_stream, scheduler=scheduler
         )
-        axs[3].set_title("Build Power Utilization")
-        axs[3].set_ylabel("Construction Power")
-        axs[3].legend(loc="upper left")
+        game.run(max_time=max_time)
 
-    if completed_tasks:
-        unique_names = sorted(list(set(task.display_name for task in completed_tasks)))
-        name_to_y = {name: i for i, name in enumerate(unique_names)}
+    write_cookbook(events_path, f"{build_name}.txt")
 
-        axs[4].set_yticks(range(len(unique_names)), labels=unique_names)
-
-        status_colors = {
-            "WORKING": "dodgerblue",
-            "STALLED": "gold",
-        }
-
-        for task in completed_tasks:
-            y_pos = name_to_y.get(task.display_name)
-            if y_pos is not None and task.status_history:
-                for i in range(len(task.status_history) - 1):
-                    start_time, status = task.status_history[i]
-                    end_time, _ = task.status_history[i + 1]
-                    duration = end_time - start_time
-                    color = status_colors.get(status, "red")
-                    axs[4].barh(
-                        y_pos,
-                        width=duration,
-                        left=start_time,
-                        height=0.5,
-                        color=color,
-                        alpha=0.7,
-                        edgecolor="black",
-                    )
-
-            if task.start_time is not None:
-                axs[4].plot(task.start_time, y_pos, marker=">", color="red", ms=6)
-            if task.completion_time is not None:
-                axs[4].plot(
-                    task.completion_time, y_pos, marker="|", color="green", ms=8, mew=2
-                )
-
-    for i in range(4):
-        axs[i].legend(loc="upper left")
-        axs[i].grid(True, linestyle="--", alpha=0.6)
-
-    axs[4].grid(True, linestyle="--", alpha=0.6)
-    axs[4].set_xlabel("Time (seconds)")
-    axs[4].set_title("Task Gantt Chart")
-
-    fig.suptitle(f"Simulation Analysis: {build_name}", fontsize=18)
-    fig.tight_layout(rect=[0, 0.03, 1, 0.96])
-    plt.show()
+    if render:
+        render_report(build_name, events_path)
     print(
         f"Simulation ended at time {game.time:.1f}s\n"
         f"Tasks completed: {game.tasks_done} of {len(game.tasks)}\n"
@@ -624,12 +658,25 @@ def run_and_collect_results(build_name: str, tasks: list, max_time: int) -> dict
     }
 
 
-def create_task_list_from_recipe(recipe: list) -> list:
+def create_task_list_from_recipe(recipe: list) -> TaskList:
     final_task_list = []
-    for name, builders, repeat in recipe:
+    for name, builders, repeat, *extra in recipe:
+        dependencies = extra[0] if len(extra) > 0 else []
+        priority = extra[1] if len(extra) > 1 else 0
         for _ in range(repeat):
-            final_task_list.append(Task(name, builders, "build"))
-    return final_task_list
+            final_task_list.append(
+                Task(name, builders, "build", dependencies, priority)
+            )
+    return TaskList(
+        final_task_list,
+        BuildGraph(final_task_list, UNITS_DATA, STARTING_UNITS, UNIT_INDEX),
+    )
+
+
+def critical_path_lower_bound(tasks: list[Task]) -> float:
+    if isinstance(tasks, TaskList):
+        return tasks.build_graph.critical_path_lower_bound()
+    return BuildGraph(tasks, UNITS_DATA, STARTING_UNITS, UNIT_INDEX).critical_path_lower_bound()
 
 
 if __name__ == "__main__":
@@ -655,6 +702,7 @@ if __name__ == "__main__":
             "armmakr",
             ["armck", "armcom"],
             1,
+            ["armestor"],
         ),
         (
             "armpw",
@@ -676,7 +724,15 @@ if __name__ == "__main__":
 
     for name, tasks in build_orders.items():
         logger.info(f"Running Shedule: {name}")
-        result = run_and_collect_results(name, tasks, max_time=simulation_duration)
+        result = run_and_collect_results(
+            name,
+            tasks,
+            max_time=simulation_duration,
+            scheduler=Scheduler(policy=LOOKAHEAD),
+            render=False,
+        )
         all_results.append(result)
 
+    render_reports(list(build_orders))
+
     print("--- All simulations completed successfully. ---")
@@ -0,0 +1,208 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.collections import PolyCollection
+
+from event_stream import (
+    EVENTS_FILE_SUFFIX,
+    TASK_COMPLETED,
+    TASK_STARTED,
+    TASK_STATUS,
+    TIMELINE,
+    read_events,
+)
+
+REPORT_FILE_SUFFIX = ".png"
+MAX_TIMELINE_POINTS = 2000
+GANTT_BAR_HEIGHT = 0.5
+STATUS_COLORS = {
+    "WORKING": "dodgerblue",
+    "STALLED": "gold",
+}
+
+
+def read_report_data(events_path: str) -> tuple[pd.DataFrame, list[dict]]:
+    timeline = []
+    tasks: dict[int, dict] = {}
+    for record in read_events(events_path):
+        event = record.pop("event")
+        if event == TIMELINE:
+            timeline.append(record)
+        elif event == TASK_STARTED:
+            tasks[record["task_id"]] = {
+                "display_name": record["display_name"],
+                "start_time": record["time"],
+                "completion_time": None,
+                "status_history": [(record["time"], "WORKING")],
+            }
+        elif event == TASK_STATUS:
+            tasks[record["task_id"]]["status_history"].append(
+                (record["time"], record["status"])
+            )
+        elif event == TASK_COMPLETED:
+            task = tasks[record["task_id"]]
+            task["completion_time"] = record["time"]
+            task["status_history"].append((record["time"], "COMPLETED"))
+    completed_tasks = [t for t in tasks.values() if t["completion_time"] is not None]
+    return pd.DataFrame(timeline), completed_tasks
+
+
+def downsample(timeline_df: pd.DataFrame, max_points: int = MAX_TIMELINE_POINTS) -> pd.DataFrame:
+    if len(timeline_df) <= max_points:
+        return timeline_df
+    step = math.ceil(len(timeline_df) / max_points)
+    sampled = timeline_df.iloc[::step]
+    if sampled.index[-1] != timeline_df.index[-1]:
+        sampled = pd.concat([sampled, timeline_df.iloc[[-1]]])
+    return sampled
+
+
+def _plot_gantt(ax, completed_tasks: list[dict]):
+    unique_names = sorted(set(task["display_name"] for task in completed_tasks))
+    name_to_y = {name: i for i, name in enumerate(unique_names)}
+    ax.set_yticks(range(len(unique_names)), labels=unique_names)
+
+    verts = []
+    colors = []
+    start_points = []
+    completion_points = []
+    half_height = GANTT_BAR_HEIGHT / 2
+    for task in completed_tasks:
+        y_pos = name_to_y[task["display_name"]]
+        history = task["status_history"]
+        for (start_time, status), (end_time, _) in zip(history, history[1:]):
+            verts.append(
+                [
+                    (start_time, y_pos - half_height),
+                    (end_time, y_pos - half_height),
+                    (end_time, y_pos + half_height),
+                    (start_time, y_pos + half_height),
+                ]
+            )
+            colors.append(STATUS_COLORS.get(status, "red"))
+        start_points.append((task["start_time"], y_pos))
+        completion_points.append((task["completion_time"], y_pos))
+
+    ax.add_collection(
+        PolyCollection(verts, facecolors=colors, edgecolors="black", alpha=0.7)
+    )
+    ax.plot(*zip(*start_points), linestyle="none", marker=">", color="red", ms=6)
+    ax.plot(
+        *zip(*completion_points),
+        linestyle="none",
+        marker="|",
+        color="green",
+        ms=8,
+        mew=2,
+    )
+    ax.autoscale_view()
+
+
+def render_report(build_name: str, events_path: str | None = None) -> str:
+    if events_path is None:
+        events_path = f"{build_name}{EVENTS_FILE_SUFFIX}"
+    output_path = f"{build_name}{REPORT_FILE_SUFFIX}"
+    timeline_df, completed_tasks = read_report_data(events_path)
+    timeline_df = downsample(timeline_df)
+
+    fig, axs = plt.subplots(
+        5,
+        1,
+        figsize=(18, 20),
+        sharex=True,
+        gridspec_kw={"height_ratios": [3, 2, 2, 2, 1.5]},
+    )
+
+    if not timeline_df.empty:
+        axs[0].plot(
+            timeline_df["time"],
+            timeline_df["metal"],
+            label="Metal Stored",
+            color="grey",
+            lw=2,
+        )
+        axs[0].plot(
+            timeline_df["time"],
+            timeline_df["energy"],
+            label="Energy Stored",
+            color="gold",
+            lw=2,
+        )
+    axs[0].set_title("Resource Storage Over Time")
+    axs[0].set_ylabel("Amount Stored")
+
+    if not timeline_df.empty:
+        axs[1].plot(
+            timeline_df["time"],
+            timeline_df["net_metal_sec"],
+            label="Net Metal/sec",
+            color="grey",
+            lw=2,
+        )
+        axs[1].plot(
+            timeline_df["time"],
+            timeline_df["net_energy_sec"],
+            label="Net Energy/sec",
+            color="gold",
+            lw=2,
+        )
+    axs[1].axhline(0, color="red", linestyle="--", lw=1)
+    axs[1].set_title("Net Income Over Time")
+    axs[1].set_ylabel("Rate (/sec)")
+
+    if not timeline_df.empty:
+        axs[2].plot(
+            timeline_df["time"],
+            timeline_df["unit_count"],
+            label="Unit Count",
+            color="cyan",
+            lw=2,
+        )
+    axs[2].set_title("Army Size Over Time")
+    axs[2].set_ylabel("Number of Units")
+
+    if not timeline_df.empty:
+        busy_power = (
+            timeline_df["total_construction_power"]
+            - timeline_df["idle_construction_power"]
+        )
+
+        axs[3].stackplot(
+            timeline_df["time"],
+            [busy_power, timeline_df["idle_construction_power"]],
+            labels=["Busy Power", "Idle Power"],
+            colors=["#2ca02c", "#d62728"],
+        )
+        axs[3].set_title("Build Power Utilization")
+        axs[3].set_ylabel("Construction Power")
+
+    if completed_tasks:
+        _plot_gantt(axs[4], completed_tasks)
+
+    for i in range(4):
+        if axs[i].has_data():
+            axs[i].legend(loc="upper left")
+        axs[i].grid(True, linestyle="--", alpha=0.6)
+
+    axs[4].grid(True, linestyle="--", alpha=0.6)
+    axs[4].set_xlabel("Time (seconds)")
+    axs[4].set_title("Task Gantt Chart")
+
+    fig.suptitle(f"Simulation Analysis: {build_name}", fontsize=18)
+    fig.tight_layout(rect=[0, 0.03, 1, 0.96])
+    fig.savefig(output_path)
+    plt.close(fig)
+    return output_path
+
+
+def render_reports(build_names: list[str], processes: int | None = None) -> list[str]:
+    if len(build_names) <= 1:
+        return [render_report(name) for name in build_names]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(render_report, build_names))
@@ -0,0 +1,205 @@
+import heapq
+import logging
+import math
+
+STRICT_ORDER = "strict"
+LOOKAHEAD = "lookahead"
+PRIORITY = "priority"
+POLICIES = (STRICT_ORDER, LOOKAHEAD, PRIORITY)
+DEFAULT_LOOKAHEAD = 5
+
+
+class Scheduler:
+    """
+    Dispatches pending tasks from queues keyed by the builders they need.
+    A dispatch pass only runs when a task completed, the economy changed or an
+    unsustainable task could have become sustainable, and it starts every task
+    it can instead of one per tick. When a queue's builders are missing or
+    busy the rest of that queue is skipped for the pass; the policy decides
+    how many tasks after the first blocked one are still considered. The
+    queues belong to the game being dispatched; passing the scheduler to
+    another game resets them.
+    """
+
+    def __init__(self, policy: str = STRICT_ORDER, lookahead: int = DEFAULT_LOOKAHEAD):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy}, expected one of {POLICIES}.")
+        self.policy = policy
+        if policy == STRICT_ORDER:
+            self.lookahead = 0
+        elif policy == PRIORITY:
+            self.lookahead = math.inf
+        else:
+            self.lookahead = lookahead
+        self.game = None
+        self._reset()
+
+    def _reset(self):
+        self.queues: dict[tuple[str, ...], list] = {}
+        self.order: dict[int, tuple] = {}
+        self.dirty: bool = True
+        self.wake_time: float = math.inf
+        self.economy: tuple = ()
+        self.passes: int = 0
+
+    def notify(self):
+        self.dirty = True
+
+    def _bind(self, game):
+        # Queues hold the tasks of one game; a scheduler handed to another
+        # game starts over from that game's pending tasks.
+        self._reset()
+        self.game = game
+        self._build_queues(game.tasks)
+
+    def _build_queues(self, tasks: list):
+        for index, task in enumerate(tasks):
+            if self.policy == PRIORITY:
+                self.order[id(task)] = (-task.priority, index)
+            else:
+                self.order[id(task)] = (index,)
+        for task in sorted(tasks, key=lambda t: self.order[id(t)]):
+            key = tuple(sorted(task.builders))
+            self.queues.setdefault(key, []).append(task)
+
+    def _best_generation(self, game) -> tuple[float, float]:
+        # Energy converters near their threshold switch on and off every tick.
+        # Taking energy with all of them off and metal with all of them on
+        # bounds what any tick can offer, independent of their current state.
+        metal_convertible = sum(
+            unit.energy_conversion_capacity * unit.energy_conversion_efficiency
+            for unit in game.units
+            if unit.energy_conversion_capacity > 0 and unit.energy_conversion_efficiency > 0
+        )
+        return (
+            game.energy_generation + game.energy_converted,
+            game.metal_generation - game.metal_converted + metal_convertible,
+        )
+
+    def _economy(self, game) -> tuple:
+        return (*self._best_generation(game), game.max_energy, game.max_metal)
+
+    def _needs_pass(self, game) -> bool:
+        return (
+            self.dirty
+            or game.time >= self.wake_time - game.TIME_STEP
+            or self._economy(game) != self.economy
+        )
+
+    def _time_until_sustainable(self, game, task, builders) -> float:
+        time_to_complete, energy_per_second, metal_per_second = (
+            game.task_resource_rates(task, builders)
+        )
+        best_energy, best_metal = self._best_generation(game)
+        wait = 0.0
+        for stock, capacity, generation, generation_future, cost in (
+            (
+                game.energy,
+                game.max_energy,
+                best_energy,
+                game.energy_generation_future + best_energy - game.energy_generation,
+                energy_per_second,
+            ),
+            (
+                game.metal,
+                game.max_metal,
+                best_metal,
+                game.metal_generation_future + best_metal - game.metal_generation,
+                metal_per_second,
+            ),
+        ):
+            needed = (cost - generation_future) * time_to_complete
+            if needed <= stock:
+                continue
+            if needed >= capacity or generation <= 0:
+                return math.inf
+            # Stalled tasks consume nothing, so storage grows at most at the
+            # gross generation rate and this never wakes up too late.
+            wait = max(wait, (needed - stock) / generation)
+        return wait
+
+    def _time_until_full(self, game) -> float:
+        wait = 0.0
+        for stock, capacity, generation in (
+            (game.energy, game.max_energy, game.energy_generation),
+            (game.metal, game.max_metal, game.metal_generation),
+        ):
+            if stock >= capacity:
+                continue
+            if generation <= 0:
+                return math.inf
+            wait = max(wait, (capacity - stock) / generation)
+        return wait
+
+    def dispatch(self, game) -> bool:
+        if not game.tasks and not game.task_in_progress:
+            logging.info("No tasks to process. Ending simulation.")
+            return False
+        if not game.tasks:
+            return True
+        if self.game is not game:
+            self._bind(game)
+        if not self._needs_pass(game):
+            return True
+
+        self.passes += 1
+        self.dirty = False
+        self.economy = self._economy(game)
+        wake = math.inf
+        started: set[tuple[str, ...]] = set()
+        blocked_seen = False
+        considered_after_block = 0
+
+        heap = [
+            (self.order[id(queue[0])], key, 0)
+            for key, queue in self.queues.items()
+            if queue
+        ]
+        heapq.heapify(heap)
+        while heap:
+            _, key, position = heapq.heappop(heap)
+            queue = self.queues[key]
+            task = queue[position]
+            if blocked_seen:
+                considered_after_block += 1
+                if considered_after_block > self.lookahead:
+                    break
+            next_entry = None
+            if position + 1 < len(queue):
+                next_entry = (self.order[id(queue[position + 1])], key, position + 1)
+
+            if not game.have_dependencies(task):
+                logging.info(f"Dependencies not built for task {task.name}. Waiting...")
+                blocked_seen = True
+            else:
+                builders = game.obtain_builders_reference(task.builders, prefer_idle=True)
+                if len(builders) == 0 or len(builders) != len(task.builders):
+                    logging.info(f"Specified builders do not exist for task {task.name}.")
+                    blocked_seen = True
+                    continue
+                if not game.check_builders_availability(task, builders):
+                    logging.info(f"Builders not available for task {task.name}. Waiting...")
+                    blocked_seen = True
+                    continue
+                if game.can_build_sustainable(task, builders):
+                    game.start_task(task, builders)
+                    game._calculate_construction_power()
+                    started.add(key)
+                else:
+                    wake = min(wake, self._time_until_sustainable(game, task, builders))
+            if next_entry is not None:
+                heapq.heappush(heap, next_entry)
+
+        for key in started:
+            self.queues[key] = [t for t in self.queues[key] if not t.started]
+
+        if not game.tasks:
+            return True
+        if started or game.task_in_progress:
+            self.wake_time = game.time + wake
+            return True
+        if game.energy == game.max_energy and game.metal == game.max_metal:
+            logging.info("No pending task can be started. Ending simulation.")
+            return False
+        self.wake_time = game.time + min(wake, self._time_until_full(game))
+        return True
@@ -1,7 +1,10 @@
 import json
 
+from unit_index import ROLE_BUILDER, build_unit_index, index_path_for, missing_build_options
+
 INPUT_FILE = 'unit_data_output.json'
 OUTPUT_FILE = 'unit_data_as_dict.json'
+INDEX_FILE = index_path_for(OUTPUT_FILE)
 
 def convert_list_to_dict():
     try:
@@ -33,5 +36,19 @@ def convert_list_to_dict():
     print(f"\nSuccess! Converted the list into a dictionary with {len(new_dict)} entries.")
     print(f"The new file is saved as '{OUTPUT_FILE}'.")
 
+    write_unit_index(new_dict)
+
+def write_unit_index(units: dict):
+    index = build_unit_index(units)
+    if missing_build_options(index):
+        print(f"ERROR: {len(index['roles'][ROLE_BUILDER])} units have build power but none has 'unit.buildOptions'. The index was not written.")
+        return
+
+    with open(INDEX_FILE, 'w') as f:
+        json.dump(index, f, indent=4)
+
+    print(f"Indexed build options for {len(index['buildables'])} builders, {len(index['roles'])} roles and {len(index['factions'])} factions.")
+    print(f"The index is saved as '{INDEX_FILE}'.")
+
 if __name__ == "__main__":
     convert_list_to_dict()
\ No newline at end of file
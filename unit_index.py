@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+
+INDEX_FILE_SUFFIX = "_index.json"
+
+ROLE_BUILDER = "builder"
+ROLE_ENERGY_GENERATOR = "energy_generator"
+ROLE_METAL_EXTRACTOR = "metal_extractor"
+ROLE_ENERGY_STORAGE = "energy_storage"
+ROLE_METAL_STORAGE = "metal_storage"
+ROLE_ENERGY_CONVERTER = "energy_converter"
+
+FACTION_PREFIXES = {
+    "arm": "armada",
+    "cor": "cortex",
+    "leg": "legion",
+}
+
+
+def index_path_for(units_path: str) -> str:
+    return os.path.splitext(units_path)[0] + INDEX_FILE_SUFFIX
+
+
+def _build_options(item: dict) -> list[str]:
+    # Build options sit with the other unit stats in the scraped definition.
+    return list(item["unit"].get("buildOptions") or [])
+
+
+def _faction(name: str, item: dict) -> str:
+    faction = item.get("faction") or item.get("unit", {}).get("faction")
+    if faction:
+        return str(faction).lower()
+    return FACTION_PREFIXES.get(name[:3], "other")
+
+
+def _roles(unit: dict) -> list[str]:
+    roles = []
+    if unit["buildPower"] > 0:
+        roles.append(ROLE_BUILDER)
+    if unit["energyProduced"] > 0 or unit["windGenerator"] > 0 or unit["tidalGenerator"] > 0:
+        roles.append(ROLE_ENERGY_GENERATOR)
+    if unit["extractsMetal"] > 0:
+        roles.append(ROLE_METAL_EXTRACTOR)
+    if unit["energyStorage"] > 0:
+        roles.append(ROLE_ENERGY_STORAGE)
+    if unit["metalStorage"] > 0:
+        roles.append(ROLE_METAL_STORAGE)
+    if unit["energyConversionCapacity"] > 0 and unit["energyConversionEfficiency"] > 0:
+        roles.append(ROLE_ENERGY_CONVERTER)
+    return roles
+
+
+def build_unit_index(units: dict) -> dict:
+    """
+    Extracts build options, roles and factions from the unit database (keyed
+    by definition name) into lookup tables that can be saved as JSON.
+    """
+    buildables: dict[str, list[str]] = {}
+    builders: dict[str, list[str]] = {}
+    roles: dict[str, list[str]] = {}
+    factions: dict[str, list[str]] = {}
+    for name, item in units.items():
+        options = [option for option in _build_options(item) if option in units]
+        if options:
+            buildables[name] = options
+            for option in options:
+                builders.setdefault(option, []).append(name)
+        for role in _roles(item["unit"]):
+            roles.setdefault(role, []).append(name)
+        factions.setdefault(_faction(name, item), []).append(name)
+    return {
+        "buildables": buildables,
+        "builders": builders,
+        "roles": roles,
+        "factions": factions,
+    }
+
+
+def missing_build_options(index: dict) -> bool:
+    """
+    True when the database has builders but none of them came with build
+    options, which means the unit data does not carry unit.buildOptions.
+    """
+    return bool(index["roles"].get(ROLE_BUILDER)) and not index["buildables"]
+
+
+class UnitIndex:
+    """
+    Constant-time lookups over the precomputed unit index: what a builder can
+    build, who can build a unit, and which units have a role or faction.
+    """
+
+    def __init__(self, index: dict):
+        self._buildables = {k: frozenset(v) for k, v in index["buildables"].items()}
+        self._builders = {k: frozenset(v) for k, v in index["builders"].items()}
+        self._roles = {k: frozenset(v) for k, v in index["roles"].items()}
+        self._factions = {k: frozenset(v) for k, v in index["factions"].items()}
+
+    @classmethod
+    def load(cls, units_path: str, units: dict) -> "UnitIndex":
+        path = index_path_for(units_path)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                index = json.load(f)
+        else:
+            index = build_unit_index(units)
+        if missing_build_options(index):
+            logging.warning(
+                f"{units_path} has builders but no unit.buildOptions; "
+                "build orders are not checked for buildability."
+            )
+        return cls(index)
+
+    def has_build_options(self, builder: str) -> bool:
+        return builder in self._buildables
+
+    def buildables(self, builder: str) -> frozenset[str]:
+        return self._buildables.get(builder, frozenset())
+
+    def builders_of(self, unit: str) -> frozenset[str]:
+        return self._builders.get(unit, frozenset())
+
+    def can_build(self, builder: str, unit: str) -> bool:
+        return unit in self._buildables.get(builder, ())
+
+    def units_with_role(self, role: str) -> frozenset[str]:
+        return self._roles.get(role, frozenset())
+
+    def faction_units(self, faction: str) -> frozenset[str]:
+        return self._factions.get(faction, frozenset())